@@ -19,7 +19,7 @@ from typing import (
 import numpy as np
 from selcol.file import default_pretrained_basepath
 from selcol.runtime import OrtSelColInferencer
-from skrobot.coordinates import Coordinates, matrix2quaternion, rpy_angle
+from skrobot.coordinates import Coordinates, matrix2quaternion
 from skrobot.coordinates.math import wxyz2xyzw
 from skrobot.model import RobotModel
 from skrobot.model.primitives import Box
@@ -28,7 +28,38 @@ from tinyfk import BaseType, KinematicModel, RotationType
 
 from skmp.kinematics import CollSpheresKinematicsMapBase, EndEffectorKinematicsMap
 from skmp.robot.utils import FCLCollisionManager, set_robot_state
-from skmp.utils import load_urdf_model_using_cache
+from skmp.utils import get_rng, load_urdf_model_using_cache
+
+# returned by constraints when jacobian is not requested
+# shared among all calls, so make it read-only
+_DUMMY_JACOBIAN = np.array([[np.nan]])
+_DUMMY_JACOBIAN.setflags(write=False)
+
+
+def _finite_or_default(value: Optional[float], default: float) -> float:
+    # NOTE: membership test like `value in [np.nan]` does not work because nan != nan
+    if value is None or not np.isfinite(value):
+        return default
+    return value
+
+
+def _batch_ypr_angle(rots: np.ndarray) -> np.ndarray:
+    """vectorized version of skrobot's rpy_angle(rot)[0]
+    input:
+        rots: R^{n, 3, 3}
+    output:
+        yprs: R^{n, 3}
+    """
+    r00, r01, r02 = rots[:, 0, 0], rots[:, 0, 1], rots[:, 0, 2]
+    r10, r11, r12 = rots[:, 1, 0], rots[:, 1, 1], rots[:, 1, 2]
+    r20 = rots[:, 2, 0]
+    eps = 4.0 * np.finfo(float).eps  # same as skrobot's _EPS
+    is_singular = np.logical_and(np.abs(r00) < eps, np.abs(r10) < eps)
+    a = np.where(is_singular, 0.0, np.arctan2(r10, r00))
+    sa, ca = np.sin(a), np.cos(a)
+    b = np.arctan2(-r20, ca * r00 + sa * r10)
+    c = np.arctan2(sa * r02 - ca * r12, -sa * r01 + ca * r11)
+    return np.stack([a, b, c], axis=1)
 
 
 class AbstractConst(ABC):
@@ -52,13 +83,61 @@ class AbstractConst(ABC):
         f, jac = self.evaluate(np.expand_dims(q, axis=0), with_jacobian)
         return f[0], jac[0]
 
+    def evaluate_into(
+        self,
+        qs: np.ndarray,
+        with_jacobian: bool,
+        out_values: np.ndarray,
+        out_jacs: Optional[np.ndarray],
+    ) -> None:
+        """same as evaluate, but write the result into preallocated arrays
+        input:
+            out_values: R^{n_point, out_dim}
+            out_jacs: R^{n_point, out_dim, dim_cspace} (None if not with_jacobian)
+        """
+        if not self.reflect_robot_flag:
+            message = "{}: you need to call reflect_skrobot_model beforehand".format(
+                type(self).__name__
+            )
+            raise RuntimeError(message)
+        self._evaluate_into(qs, with_jacobian, out_values, out_jacs)
+
     def dummy_jacobian(self) -> np.ndarray:
-        return np.array([[np.nan]])
+        return _DUMMY_JACOBIAN
+
+    def out_dim(self) -> Optional[int]:
+        """dimension of the constraint values if known before evaluation"""
+        return None
 
     @abstractmethod
     def _evaluate(self, qs: np.ndarray, with_jacobian: bool) -> Tuple[np.ndarray, np.ndarray]:
         ...
 
+    def _evaluate_into(
+        self,
+        qs: np.ndarray,
+        with_jacobian: bool,
+        out_values: np.ndarray,
+        out_jacs: Optional[np.ndarray],
+    ) -> None:
+        # override this if the constraint can directly write into the output
+        values, jacs = self._evaluate(qs, with_jacobian)
+        # NOTE: check explicitly, as assignment broadcasts e.g. (n, 1) into (n, out_dim)
+        if values.shape != out_values.shape:
+            message = "{}: values of shape {} does not match the output of shape {}".format(
+                type(self).__name__, values.shape, out_values.shape
+            )
+            raise ValueError(message)
+        out_values[...] = values
+        if with_jacobian:
+            assert out_jacs is not None
+            if jacs.shape != out_jacs.shape:
+                message = "{}: jacobians of shape {} does not match the output of shape {}".format(
+                    type(self).__name__, jacs.shape, out_jacs.shape
+                )
+                raise ValueError(message)
+            out_jacs[...] = jacs
+
     def reflect_skrobot_model(self, robot_model: Optional[RobotModel]) -> None:
         """reflect skrobot model state to internal state
         Although constraints does not necessarily require to reflect robot model,
@@ -109,6 +188,21 @@ class VectorDescriptable(Protocol):
         ...
 
 
+@runtime_checkable
+class SDFWithGrad(Protocol):
+    """sdf that can provide its analytical gradient
+    If sdf passed to collision constraints satisfies this protocol,
+    finite-difference gradient computation is skipped.
+    """
+
+    def __call__(self, xs: np.ndarray) -> np.ndarray:
+        ...
+
+    def value_and_grad(self, xs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """return signed distances R^{n_point} and gradients R^{n_point, dim}"""
+        ...
+
+
 CompositeConstT = TypeVar("CompositeConstT", bound="_CompositeConst")
 InnerConstT = TypeVar("InnerConstT", bound=Union[AbstractIneqConst, AbstractEqConst])
 
@@ -129,14 +223,38 @@ class _CompositeConst(AbstractConst, Generic[InnerConstT]):
 
         self._remove_duplication()
 
+    def out_dim(self) -> Optional[int]:
+        # NOTE: not cached, as out_dim of a child may change after construction
+        # (e.g. by setting only_closest_feature of CollFreeConst)
+        out_dim = 0
+        for const in self.const_list:
+            dim = const.out_dim()
+            if dim is None:
+                return None
+            out_dim += dim
+        return out_dim
+
     def _evaluate(self, qs: np.ndarray, with_jacobian: bool) -> Tuple[np.ndarray, np.ndarray]:
+        n_point, n_dim = qs.shape
+        out_dim = self.out_dim()
+        if out_dim is not None:
+            # allocate the output only once and let each constraint write into it
+            valuess_out = np.empty((n_point, out_dim))
+            jacs_out = np.empty((n_point, out_dim, n_dim)) if with_jacobian else None
+            self._evaluate_into(qs, with_jacobian, valuess_out, jacs_out)
+            if jacs_out is None:
+                return valuess_out, self.dummy_jacobian()
+            return valuess_out, jacs_out
+
+        # fallback for the case that some constraint does not know its out_dim
         valuess_list = []
         jacs_list = []
 
         for const in self.const_list:
             values, jac = const.evaluate(qs, with_jacobian=with_jacobian)
             valuess_list.append(values)
-            jacs_list.append(jac)
+            if with_jacobian:
+                jacs_list.append(jac)
 
         valuess_out = np.hstack(valuess_list)
 
@@ -146,6 +264,22 @@ class _CompositeConst(AbstractConst, Generic[InnerConstT]):
         jacs_out = np.concatenate(jacs_list, axis=1)
         return valuess_out, jacs_out
 
+    def _evaluate_into(
+        self,
+        qs: np.ndarray,
+        with_jacobian: bool,
+        out_values: np.ndarray,
+        out_jacs: Optional[np.ndarray],
+    ) -> None:
+        head = 0
+        for const in self.const_list:
+            dim = const.out_dim()
+            assert dim is not None
+            sl = slice(head, head + dim)
+            jacs = None if out_jacs is None else out_jacs[:, sl]
+            const.evaluate_into(qs, with_jacobian, out_values[:, sl], jacs)
+            head += dim
+
     def _reflect_skrobot_model(self, robot_model: Optional[RobotModel]) -> None:
         for const in self.const_list:
             const.reflect_skrobot_model(robot_model)
@@ -184,10 +318,14 @@ class BoxConst(AbstractIneqConst):
     lb: np.ndarray
     ub: np.ndarray
     names: Optional[List[str]]
+    _jac_single: np.ndarray
 
     def __init__(self, lb: np.ndarray, ub: np.ndarray, names: Optional[List[str]] = None) -> None:
         self.lb = lb
         self.ub = ub
+        # jacobian of box constraint is constant, so compute it only once here
+        dim = len(lb)
+        self._jac_single = np.vstack((np.eye(dim), -np.eye(dim)))
         if names is None:
             names = ["<unnamed>" for _ in range(len(lb))]
 
@@ -197,15 +335,15 @@ class BoxConst(AbstractIneqConst):
         self.assign_id_value()
 
     def write_violation_info(self, q: np.ndarray, msgs: List[str]):
-        lb_violation_indices = np.where(q < self.lb)[0]
-        ub_violation_indices = np.where(q > self.ub)[0]
-        if len(lb_violation_indices) == 0 and len(ub_violation_indices) == 0:
+        is_lb_violated = q < self.lb
+        is_ub_violated = q > self.ub
+        if not np.any(is_lb_violated | is_ub_violated):
             return
         assert self.names is not None
-        for i, name in zip(lb_violation_indices, self.names):
-            msgs.append(f"lb violation: {name} {q[i]} < {self.lb[i]}")
-        for i, name in zip(ub_violation_indices, self.names):
-            msgs.append(f"ub violation: {name} {q[i]} > {self.ub[i]}")
+        for i in np.flatnonzero(is_lb_violated):
+            msgs.append(f"lb violation: {self.names[i]} {q[i]} < {self.lb[i]}")
+        for i in np.flatnonzero(is_ub_violated):
+            msgs.append(f"ub violation: {self.names[i]} {q[i]} > {self.ub[i]}")
 
     @classmethod
     def from_urdf(
@@ -221,16 +359,8 @@ class BoxConst(AbstractIneqConst):
         names = joint_names
         for joint_name in joint_names:
             limit: JointLimit = urdf.joint_map[joint_name].limit
-
-            if limit.lower in [-np.inf, np.nan, None]:
-                b_min.append(-2 * np.pi)
-            else:
-                b_min.append(limit.lower)
-
-            if limit.upper in [+np.inf, np.nan, None]:
-                b_max.append(2 * np.pi)
-            else:
-                b_max.append(limit.upper)
+            b_min.append(_finite_or_default(limit.lower, -2 * np.pi))
+            b_max.append(_finite_or_default(limit.upper, 2 * np.pi))
 
         if base_bounds is not None:
             names += ["x", "y", "z", "roll", "pitch", "yaw"]
@@ -245,22 +375,38 @@ class BoxConst(AbstractIneqConst):
 
     def _evaluate(self, qs: np.ndarray, with_jacobian: bool) -> Tuple[np.ndarray, np.ndarray]:
         n_point, dim = qs.shape
-        f_lower = (qs - self.lb).flatten()
-        f_upper = (self.ub - qs).flatten()
-        f = np.hstack((f_lower, f_upper)).reshape(n_point, -1)
+        f = np.empty((n_point, 2 * dim))
+        np.subtract(qs, self.lb, out=f[:, :dim])
+        np.subtract(self.ub, qs, out=f[:, dim:])
         if with_jacobian:
-            jac_single = np.vstack((np.eye(dim), -np.eye(dim)))
-            jac = np.array([jac_single for _ in range(n_point)])
+            # NOTE: read-only view without copy
+            jac = np.broadcast_to(self._jac_single, (n_point, 2 * dim, dim))
         else:
             jac = self.dummy_jacobian()
         return f, jac
 
+    def _evaluate_into(
+        self,
+        qs: np.ndarray,
+        with_jacobian: bool,
+        out_values: np.ndarray,
+        out_jacs: Optional[np.ndarray],
+    ) -> None:
+        dim = qs.shape[1]
+        np.subtract(qs, self.lb, out=out_values[:, :dim])
+        np.subtract(self.ub, qs, out=out_values[:, dim:])
+        if with_jacobian:
+            assert out_jacs is not None
+            out_jacs[...] = self._jac_single
+
+    def out_dim(self) -> Optional[int]:
+        return 2 * len(self.lb)
+
     def _reflect_skrobot_model(self, robot_model: Optional[RobotModel]) -> None:
         pass
 
     def sample(self) -> np.ndarray:
-        w = self.ub - self.lb
-        return np.random.rand(len(w)) * w + self.lb
+        return get_rng().uniform(self.lb, self.ub)
 
 
 class CollFreeConst(AbstractIneqConst):
@@ -268,6 +414,9 @@ class CollFreeConst(AbstractIneqConst):
     sdf: Callable[[np.ndarray], np.ndarray]
     only_closest_feature: bool
     distance_margin: float
+    _fd_scratch: Optional[np.ndarray] = None  # reused buffer for finite difference
+    _radii: np.ndarray
+    _sdf_has_grad: bool
 
     def __init__(
         self,
@@ -279,7 +428,10 @@ class CollFreeConst(AbstractIneqConst):
     ) -> None:
         self.colkin = colkin
         self.sdf = sdf
+        # NOTE: isinstance check against runtime protocol is slow, so do it only once
+        self._sdf_has_grad = isinstance(sdf, SDFWithGrad)
         self.reflect_skrobot_model(robot_model)
+        self._radii = np.array(colkin.get_radius_list(), dtype=np.float64)
         self.only_closest_feature = only_closest_feature
         self.distance_margin = distance_margin
         self.assign_id_value()
@@ -308,26 +460,26 @@ class CollFreeConst(AbstractIneqConst):
         values = np.zeros([n_point, 1])
         Js = np.zeros([n_point, 1, dim_cspace])
 
-        radii = np.array(self.colkin.get_radius_list())
         for i in range(n_point):
             xs = xss[i]
             sds_stacked = self.sdf(xs)
-            sds_stacked_sphere_considered = sds_stacked - radii
+            sds_stacked_sphere_considered = sds_stacked - self._radii
             idx_closest = np.argmin(sds_stacked_sphere_considered)
             values[i] = sds_stacked_sphere_considered[idx_closest]
 
             if with_jacobian:
-                eps = 1e-7
                 xs_closest = xs[idx_closest]
                 jac_closest = jacss[i][idx_closest]
 
-                grad = np.zeros(dim_tspace)
-
-                for j in range(dim_tspace):
-                    xs_closest_plus = copy.deepcopy(xs_closest)
-                    xs_closest_plus[j] += eps
-                    sd_closest_plus = self.sdf(np.expand_dims(xs_closest_plus, axis=0))[0]
-                    grad[j] = (sd_closest_plus - sds_stacked[idx_closest]) / eps
+                if self._sdf_has_grad:
+                    _, grads = self.sdf.value_and_grad(xs_closest[None])  # type: ignore[attr-defined]
+                    grad = grads[0]
+                else:
+                    eps = 1e-7
+                    # each row of xs_closest_plus is perturbed along each axis
+                    xs_closest_plus = xs_closest + np.eye(dim_tspace) * eps
+                    sds_closest_plus = self.sdf(xs_closest_plus)
+                    grad = (sds_closest_plus - sds_stacked[idx_closest]) / eps
                 Js[i, 0, :] = grad.dot(jac_closest)
 
         return values, Js
@@ -350,29 +502,43 @@ class CollFreeConst(AbstractIneqConst):
         xss, jacss = self.colkin.map(qs)  # ss refere to points of points
 
         xs_stacked = xss.reshape((n_point * n_feature, dim_tspace))
-        sds_stacked = self.sdf(xs_stacked)
+        grads_stacked: Optional[np.ndarray] = None
+        if with_jacobian and self._sdf_has_grad:
+            sds_stacked, grads_stacked = self.sdf.value_and_grad(xs_stacked)  # type: ignore[attr-defined]
+        else:
+            sds_stacked = self.sdf(xs_stacked)
 
         # compute sd_vals_stacked
-        margin_radius = np.tile(np.array(self.colkin.get_radius_list()), n_point)
-        fs_stacked = sds_stacked - margin_radius
-        fss = fs_stacked.reshape(n_point, n_feature)
+        fss = sds_stacked.reshape(n_point, n_feature) - self._radii
 
         # compute jacobian by chain rule
         if with_jacobian:
-            eps = 1e-7
-            grads_stacked = np.zeros((n_feature * n_point, dim_tspace))
-
-            for i in range(dim_tspace):
-                xs_stacked_plus = copy.deepcopy(xs_stacked)
-                xs_stacked_plus[:, i] += eps
-                sds_stacked_plus = self.sdf(xs_stacked_plus)
-                grads_stacked[:, i] = (sds_stacked_plus - sds_stacked) / eps
+            if grads_stacked is None:
+                eps = 1e-7
+                # perturb all axes at once and call sdf only once
+                # the perturbed points are written into the scratch buffer, which is
+                # allocated only when the requested size exceeds the current one
+                n_require = dim_tspace * n_point * n_feature
+                if self._fd_scratch is None or self._fd_scratch.shape[0] < n_require:
+                    self._fd_scratch = np.empty((n_require, dim_tspace))
+                xs_stacked_plus = self._fd_scratch[:n_require]
+                xss_plus = xs_stacked_plus.reshape(dim_tspace, n_point * n_feature, dim_tspace)
+                xss_plus[...] = xs_stacked
+                axes = np.arange(dim_tspace)
+                xss_plus[axes, :, axes] += eps
+                sdss_plus = self.sdf(xs_stacked_plus).reshape(dim_tspace, -1)
+                grads_stacked = (sdss_plus - sds_stacked).T / eps
             gradss = grads_stacked.reshape((n_point, n_feature, dim_tspace))
-            Jss = np.einsum("ijk,ijkl->ijl", gradss, jacss)
+            # (n_point, n_feature, 1, dim_tspace) @ (n_point, n_feature, dim_tspace, dim_cspace)
+            # is dispatched to batched gemm, which is much faster than einsum
+            Jss = np.matmul(gradss[:, :, None, :], jacss).squeeze(axis=2)
         else:
             Jss = self.dummy_jacobian()
         return fss, Jss
 
+    def out_dim(self) -> Optional[int]:
+        return 1 if self.only_closest_feature else self.colkin.n_feature
+
     def _reflect_skrobot_model(self, robot_model: Optional[RobotModel]) -> None:
         assert robot_model, "robot_model must not be None"
         self.colkin.reflect_skrobot_model(robot_model)
@@ -385,31 +551,45 @@ class PointCollFreeConst(AbstractIneqConst):
 
     sdf: Callable[[np.ndarray], np.ndarray]
     eps: float = 1e-6
+    _sdf_has_grad: bool
 
     def __init__(self, sdf: Callable[[np.ndarray], np.ndarray]):
         self.sdf = sdf
+        # NOTE: isinstance check against runtime protocol is slow, so do it only once
+        self._sdf_has_grad = isinstance(sdf, SDFWithGrad)
         self.reflect_skrobot_model(None)
         self.assign_id_value()
 
     def _evaluate(self, qs: np.ndarray, with_jacobian: bool) -> Tuple[np.ndarray, np.ndarray]:
         n_point, n_dim = qs.shape
-        jacs_stacked = np.zeros((n_point, 1, n_dim))
+        if not with_jacobian:
+            return self.sdf(qs).reshape(-1, 1), self.dummy_jacobian()
+
+        if self._sdf_has_grad:
+            fs, grads = self.sdf.value_and_grad(qs)  # type: ignore[attr-defined]
+            return fs.reshape(-1, 1), grads.reshape(n_point, 1, n_dim)
+
         fs = self.sdf(qs)
-        for i in range(n_dim):
-            qs1 = copy.deepcopy(qs)
-            qs1[:, i] += self.eps
-            jacs_stacked[:, :, i] = (self.sdf(qs1) - fs) / self.eps
+        perturbations = np.expand_dims(np.eye(n_dim) * self.eps, axis=1)
+        qs_plus = (qs[None, :, :] + perturbations).reshape(-1, n_dim)
+        fss_plus = self.sdf(qs_plus).reshape(n_dim, n_point)
+        jacs_stacked = ((fss_plus - fs) / self.eps).T.reshape(n_point, 1, n_dim)
         return fs.reshape(-1, 1), jacs_stacked
 
+    def out_dim(self) -> Optional[int]:
+        return 1
+
     def _reflect_skrobot_model(self, robot_model: Optional[RobotModel]) -> None:
         return None
 
 
 class ConfigPointConst(AbstractEqConst):
     desired_angles: np.ndarray
+    _eye: np.ndarray
 
     def __init__(self, desired_angles: np.ndarray) -> None:
         self.desired_angles = desired_angles
+        self._eye = np.eye(len(desired_angles))
         self.reflect_skrobot_model(None)
         self.assign_id_value()
 
@@ -417,11 +597,26 @@ class ConfigPointConst(AbstractEqConst):
         n_point, dim = qs.shape
         val = qs - self.desired_angles
         if with_jacobian:
-            jac = np.array([np.eye(dim) for _ in range(n_point)])
+            jac = np.broadcast_to(self._eye, (n_point, dim, dim))
         else:
             jac = self.dummy_jacobian()
         return val, jac
 
+    def _evaluate_into(
+        self,
+        qs: np.ndarray,
+        with_jacobian: bool,
+        out_values: np.ndarray,
+        out_jacs: Optional[np.ndarray],
+    ) -> None:
+        np.subtract(qs, self.desired_angles, out=out_values)
+        if with_jacobian:
+            assert out_jacs is not None
+            out_jacs[...] = self._eye
+
+    def out_dim(self) -> Optional[int]:
+        return len(self.desired_angles)
+
     def _reflect_skrobot_model(self, robot_model: Optional[RobotModel]) -> None:
         pass
 
@@ -433,6 +628,7 @@ class PoseConstraint(AbstractEqConst):
     efkin: EndEffectorKinematicsMap
     desired_poses: List[np.ndarray]
     debug_rank_deficiency: bool = False
+    _target: np.ndarray  # flattened desired_poses
 
     def __init__(
         self,
@@ -443,6 +639,9 @@ class PoseConstraint(AbstractEqConst):
     ) -> None:
         assert len(desired_poses) == efkin.n_feature
         self.desired_poses = desired_poses
+        self._target = np.hstack(desired_poses).astype(np.float64, copy=False)
+        # NOTE: exposed by get_description without copy
+        self._target.setflags(write=False)
         self.efkin = efkin
         self.reflect_skrobot_model(robot_model)
         self.debug_rank_deficiency = debug_rank_deficiency
@@ -455,10 +654,7 @@ class PoseConstraint(AbstractEqConst):
         xs_tmp, jacs_tmp = self.efkin.map(qs)
         xs = xs_tmp.reshape(n_point, -1)
         jacs = jacs_tmp.reshape(n_point, -1, n_dim)
-        n_point, dim = qs.shape
-
-        target = np.hstack(self.desired_poses)
-        values = xs - target
+        values = xs - self._target
         if self.debug_rank_deficiency:
             for i in range(len(jacs)):
                 jac = jacs[i]
@@ -479,30 +675,29 @@ class PoseConstraint(AbstractEqConst):
         robot_model: RobotModel,
         debug_rank_deficiency: bool = False,
     ) -> "PoseConstraint":
-        vector_list = []
-        for co in co_list:
-            pos = co.worldpos()
-            if efkin.rot_type == RotationType.RPY:
-                ypr = rpy_angle(co.worldrot())[0]
-                rpy = np.flip(ypr)
-                vector = np.hstack([pos, rpy])
-            elif efkin.rot_type == RotationType.XYZW:
-                xyzw = wxyz2xyzw(matrix2quaternion(co.worldrot()))
-                vector = np.hstack([pos, xyzw])
-            elif efkin.rot_type == RotationType.IGNORE:
-                vector = pos
-            else:
-                assert False
-
-            vector_list.append(vector)
-        return cls(vector_list, efkin, robot_model, debug_rank_deficiency)
+        positions = np.array([co.worldpos() for co in co_list])
+        if efkin.rot_type == RotationType.RPY:
+            rots = np.array([co.worldrot() for co in co_list])
+            rpys = np.flip(_batch_ypr_angle(rots), axis=1)
+            vectors = np.hstack([positions, rpys])
+        elif efkin.rot_type == RotationType.XYZW:
+            xyzws = np.array([wxyz2xyzw(matrix2quaternion(co.worldrot())) for co in co_list])
+            vectors = np.hstack([positions, xyzws])
+        elif efkin.rot_type == RotationType.IGNORE:
+            vectors = positions
+        else:
+            assert False
+        return cls(list(vectors), efkin, robot_model, debug_rank_deficiency)
+
+    def out_dim(self) -> Optional[int]:
+        return len(self._target)
 
     def _reflect_skrobot_model(self, robot_model: Optional[RobotModel]) -> None:
         assert robot_model is not None
         self.efkin.reflect_skrobot_model(robot_model)
 
     def get_description(self) -> np.ndarray:
-        return np.hstack(self.desired_poses)
+        return self._target
 
 
 class RelativePoseConstraint(AbstractEqConst):
@@ -526,6 +721,12 @@ class RelativePoseConstraint(AbstractEqConst):
         # and we are going to try to match feature 2 and feature 3
         assert efkin.n_feature == 3
 
+        # feature-1 itself is not used in the evaluation. So, remove it from the
+        # output features to avoid wasting fk computation. Note that feature-3 is
+        # still attached to the link of feature-1 in the fksolver.
+        efkin.tinyfk_feature_ids = efkin.tinyfk_feature_ids[1:]
+        efkin.n_feature -= 1
+
         self.desired_relative_position = desired_relative_position
         self.efkin = efkin
         self.reflect_skrobot_model(robot_model)
@@ -534,22 +735,26 @@ class RelativePoseConstraint(AbstractEqConst):
     def _evaluate(self, qs: np.ndarray, with_jacobian: bool) -> Tuple[np.ndarray, np.ndarray]:
         n_point, n_dim = qs.shape
         xs, jacs = self.efkin.map(
-            qs
+            qs, with_jacobian=with_jacobian
         )  # xs: R^(n_point, n_task), jacs: R^(n_point, n_feature, n_task, n_dof)
 
-        points_feature2 = xs[:, 1, :]
-        points_feature3 = xs[:, 2, :]
+        # NOTE: feature-1 is removed in the constructor
+        points_feature2 = xs[:, 0, :]
+        points_feature3 = xs[:, 1, :]
 
         diffs = points_feature2 - points_feature3  # R^(n_point, n_task)
 
         if not with_jacobian:
             return diffs, self.dummy_jacobian()
         else:
-            jacs_feature2 = jacs[:, 1, :, :]
-            jacs_feature3 = jacs[:, 2, :, :]
+            jacs_feature2 = jacs[:, 0, :, :]
+            jacs_feature3 = jacs[:, 1, :, :]
             jacs_diff = jacs_feature2 - jacs_feature3  # R^(n_point, n_task, n_dof)
             return diffs, jacs_diff
 
+    def out_dim(self) -> Optional[int]:
+        return self.efkin.dim_tspace
+
     def _reflect_skrobot_model(self, robot_model: Optional[RobotModel]) -> None:
         assert robot_model is not None
         self.efkin.reflect_skrobot_model(robot_model)
@@ -602,6 +807,9 @@ class FixedZAxisConstraint(AbstractEqConst):
         )
         return diffs, jacs_diff
 
+    def out_dim(self) -> Optional[int]:
+        return 2 * self.n_feature
+
     def _reflect_skrobot_model(self, robot_model: Optional[RobotModel]) -> None:
         assert robot_model is not None
         self.efkin.reflect_skrobot_model(robot_model)
@@ -637,7 +845,10 @@ class FCLSelfCollFreeConst(AbstractIneqConst):
             is_valid = not self.fcl_col_manager.check_self_collision()
             values.append(float(is_valid) - 0.5)
         assert not with_jacobian
-        return np.array(values), self.dummy_jacobian()
+        return np.array(values).reshape(-1, 1), self.dummy_jacobian()
+
+    def out_dim(self) -> Optional[int]:
+        return 1
 
     def _reflect_skrobot_model(self, robot_model: RobotModel) -> None:
         for joint_self, joint_other in zip(self.robot_model.joint_list, robot_model.joint_list):
@@ -672,7 +883,10 @@ class SkrobotMeshSelfCollFreeConst(AbstractIneqConst):
             is_valid = len(set(collision_pairs) - self.ignore_pairs) == 0
             values.append(float(is_valid) - 0.5)
         assert not with_jacobian
-        return np.array(values), self.dummy_jacobian()
+        return np.array(values).reshape(-1, 1), self.dummy_jacobian()
+
+    def out_dim(self) -> Optional[int]:
+        return 1
 
     def _reflect_skrobot_model(self, robot_model: Optional[RobotModel]) -> None:
         pass
@@ -725,17 +939,11 @@ class PairWiseSelfCollFreeConst(AbstractIneqConst):
             # for example, if sphere is large, the margin must be large
             # but for small one, we don't need large margin.
             rs_with_margin = rs * 3
-            collision_pair_indices = np.where(dists - rs_with_margin < 0)[0]
-            collision_pairs = [all_index_pairs[idx] for idx in collision_pair_indices]
-
-            # subtract collision pairs from the all pairs
-            valid_sphere_id_pair_set = set(all_index_pairs).difference(set(collision_pairs))
-            valid_sphere_id_pairs = list(valid_sphere_id_pair_set)
-            valid_sphere_pair_dists = np.array(
-                [pair_pair_dist_table[pair] for pair in valid_sphere_id_pairs]
-            )
-            id_pairs = valid_sphere_id_pairs
-            pair_dists = valid_sphere_pair_dists
+            is_colliding = dists - rs_with_margin < 0
+
+            # remove collision pairs from the all pairs keeping the original order
+            id_pairs = [pair for pair, c in zip(all_index_pairs, is_colliding) if not c]
+            pair_dists = rs[~is_colliding]
         else:
             pair_dists = np.array([pair_pair_dist_table[pair] for pair in id_pairs])
 
@@ -758,25 +966,24 @@ class PairWiseSelfCollFreeConst(AbstractIneqConst):
         )
         sqdistss = sqdists_stacked.reshape(n_wp, -1)
         valuess = sqdistss - self.check_sphere_pair_sqdists
+        if with_jacobian:
+            gradss = grads_stacked.reshape(n_wp, -1, n_dim)
 
         if self.only_closest_feature:
-            min_valuess = np.expand_dims(np.min(valuess, axis=1), axis=1)
+            idx_mins = np.argmin(valuess, axis=1)
+            min_valuess = np.take_along_axis(valuess, idx_mins[:, None], axis=1)
             if not with_jacobian:
                 return min_valuess, self.dummy_jacobian()
-            else:
-                min_jacs = np.zeros((n_wp, 1, n_dim))
-                gradss = grads_stacked.reshape(n_wp, -1, n_dim)
-                for i in range(n_wp):
-                    values, grads = valuess[i], gradss[i]
-                    idx_min = np.argmin(values)
-                    min_jacs[i, 0, :] = grads[idx_min]
+            min_jacs = np.take_along_axis(gradss, idx_mins[:, None, None], axis=1)
             return min_valuess, min_jacs
         else:
             if not with_jacobian:
                 return valuess, self.dummy_jacobian()
-            gradss = grads_stacked.reshape(n_wp, -1, n_dim)
             return valuess, gradss
 
+    def out_dim(self) -> Optional[int]:
+        return 1 if self.only_closest_feature else len(self.check_sphere_id_pairs)
+
     def _reflect_skrobot_model(self, robot_model: Optional[RobotModel]) -> None:
         assert robot_model is not None
         self.colkin.reflect_skrobot_model(robot_model)
@@ -812,31 +1019,31 @@ class NeuralSelfCollFreeConst(AbstractIneqConst):
     ) -> Tuple[np.ndarray, np.ndarray]:
         n_point, n_dim = qs.shape
 
-        val_list = []
-        grad_list = []
-        for q in qs:
-            if self.base_type == BaseType.PLANER:
-                q = q[:-3]  # because base pose is irrelevant to self collision
-            if self.base_type == BaseType.FLOATING:
-                q = q[:-6]  # because base pose is irrelevant to self collision
-
-            val, grad = self.model.infer(q, with_grad=with_jacobian)
-            val_list.append(self.threshold - val)
-            if self.base_type == BaseType.PLANER:
-                grad = np.hstack((grad, np.zeros(3)))
-            if self.base_type == BaseType.FLOATING:
-                grad = np.hstack((grad, np.zeros(6)))
-            grad_list.append(-grad)
-
-        valss = np.array(val_list).reshape(n_point, 1)
+        # because base pose is irrelevant to self collision
+        n_base_dof = 0
+        if self.base_type == BaseType.PLANER:
+            n_base_dof = 3
+        elif self.base_type == BaseType.FLOATING:
+            n_base_dof = 6
+        n_joint = n_dim - n_base_dof
+        qs_joint = qs[:, :n_joint]
+
+        # NOTE: inferencer only accepts a single q, so we cannot avoid the loop here.
+        # but everything else is done in a batch manner
+        results = [self.model.infer(q, with_grad=with_jacobian) for q in qs_joint]
+        vals = np.array([val for val, _ in results])
+        valss = (self.threshold - vals).reshape(n_point, 1)
 
         if not with_jacobian:
             return valss, self.dummy_jacobian()
 
-        grads = np.array(grad_list)
-        jacs = grads.reshape(n_point, 1, n_dim)
+        jacs = np.zeros((n_point, 1, n_dim))
+        jacs[:, 0, :n_joint] = -np.array([grad for _, grad in results])
         return valss, jacs
 
+    def out_dim(self) -> Optional[int]:
+        return 1
+
     def _reflect_skrobot_model(self, robot_model: Optional[RobotModel]) -> None:
         angles = [robot_model.__dict__[jn].joint_angle() for jn in self.model.joint_names]
         self.model.set_context(np.array(angles))
@@ -914,18 +1121,18 @@ class COMStabilityConst(AbstractIneqConst):
         sds = -self.com_box.sdf(xs)
         if with_jacobian:
             eps = 1e-7
-            grads = np.zeros((n_point, 1, 3))
+            perturbations = np.expand_dims(np.eye(3) * eps, axis=1)
+            xs_plus = (xs[None, :, :] + perturbations).reshape(-1, 3)
+            sdss_plus = -self.com_box.sdf(xs_plus).reshape(3, n_point)
+            grads = ((sdss_plus - sds) / eps).T.reshape(n_point, 1, 3)
 
-            for i in range(3):
-                xs_plus = copy.deepcopy(xs)
-                xs_plus[:, i] += eps
-                sds_plus = -self.com_box.sdf(xs_plus)
-                grads[:, 0, i] = (sds_plus - sds) / eps
-
-            Js = np.einsum("ijk,ijkl->ijl", grads, jacs)
+            Js = np.matmul(grads[:, :, None, :], jacs).squeeze(axis=2)
         else:
             Js = self.dummy_jacobian()
         return sds.reshape((n_point, 1)), Js
 
+    def out_dim(self) -> Optional[int]:
+        return 1
+
     def _reflect_skrobot_model(self, robot_model: Optional[RobotModel]) -> None:
         pass
@@ -48,7 +48,12 @@ def satisfy_by_optimization(
     ineq_const: Optional[AbstractIneqConst],
     q_seed: Optional[np.ndarray],
     config: Optional[SatisfactionConfig] = None,
+    check_interruption: Optional[Callable[[], None]] = None,
 ) -> SatisfactionResult:
+    """
+    check_interruption: called at every objective evaluation and supposed to raise
+    an exception to stop the optimization (e.g. AbstractSolver.check_interruption)
+    """
     ts = time.time()
     if config is None:
         config = SatisfactionConfig()
@@ -65,6 +70,8 @@ def satisfy_by_optimization(
         const_used_in_objfun = eq_const
 
     def objective_fun(q: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        if check_interruption is not None:
+            check_interruption()
         vals, jac = const_used_in_objfun.evaluate_single(q, with_jacobian=True)
         f = vals.dot(vals)
         grad = 2 * vals.dot(jac)
@@ -5,6 +5,8 @@ from typing import Callable, List, Optional, Tuple
 
 import numpy as np
 
+from skmp.utils import get_rng
+
 
 class ExtensionResult(Enum):
     REACHED = 0
@@ -90,7 +92,7 @@ class ManifoldRRT(ABC):
         return len(self.b_min)
 
     def sample(self) -> np.ndarray:
-        q = np.random.rand(self.dof) * (self.b_max - self.b_min) + self.b_min
+        q = get_rng().uniform(self.b_min, self.b_max)
         return q
 
     def find_nearest_node(self, q: np.ndarray) -> Node:
@@ -3,7 +3,7 @@ import pickle
 import shutil
 import subprocess
 import tempfile
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Generic, List, Optional, Tuple, Type, TypeVar, Union
 
@@ -155,6 +155,13 @@ class NearestNeigborSolver(AbstractSolver[ConfigT, ResultT, np.ndarray]):
     axes: Optional[np.ndarray]
     previous_est_positive: Optional[bool] = None
     previous_false_positive: Optional[bool] = None
+    _none_mask: np.ndarray = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # keep feasibility of trajectories also as a contiguous array for vectorized counting
+        self._none_mask = np.fromiter(
+            (traj is None for traj in self.trajectories), dtype=bool, count=len(self.trajectories)
+        )
 
     @classmethod
     def from_chunked_library(
@@ -216,22 +223,24 @@ class NearestNeigborSolver(AbstractSolver[ConfigT, ResultT, np.ndarray]):
             # Hauser, Kris. "Learning the problem-optimum map: Analysis and application to global optimization in robotics." IEEE Transactions on Robotics 33.1 (2016): 141-152.
             # actually, the threshold can be tuned wrt specified fp-rate, but what we vary is only integer
             # we have little control over the fp-rate. So just use the best threshold in terms of the accuracy
-            errors = []
-            thresholds = list(range(1, knn + 1))
-            for threshold in thresholds:
-                error = 0
-                for i, (desc, traj) in enumerate(dataset):
-                    k_nearests = tree.query(np.array([desc]), k=knn + 1, return_distance=False)[0][
-                        1:
-                    ]
-                    none_count_in_knn = sum(1 for idx in k_nearests if trajectories[idx] is None)
-                    seems_infeasible = none_count_in_knn >= threshold
-                    actually_infeasible = traj is None
-                    if seems_infeasible != actually_infeasible:
-                        error += 1
-                errors.append(error)
-            print(f"t-error pairs: {list(zip(thresholds, errors))}")
-            infeasibility_threshold = thresholds[np.argmin(errors)]
+            none_mask = np.fromiter(
+                (traj is None for traj in trajectories), dtype=bool, count=len(trajectories)
+            )
+
+            # query all the data at once. the first neighbor is the data itself (leave-one-out)
+            # NOTE: dual tree traversal prunes node pairs instead of per-point distance
+            # computation, which pays off when the query set is the whole dataset
+            k_nearestss = tree.query(vec_descs, k=knn + 1, return_distance=False, dualtree=True)[
+                :, 1:
+            ]
+            none_counts_in_knn = none_mask[k_nearestss].sum(axis=1)
+
+            # evaluate all the thresholds at once
+            thresholds = np.arange(1, knn + 1)
+            seems_infeasibles = none_counts_in_knn[None, :] >= thresholds[:, None]
+            errors = np.sum(seems_infeasibles != none_mask[None, :], axis=1)
+            print(f"t-error pairs: {list(zip(thresholds.tolist(), errors.tolist()))}")
+            infeasibility_threshold = int(thresholds[np.argmin(errors)])
         return cls(
             config,
             internal_solver,
@@ -243,17 +252,17 @@ class NearestNeigborSolver(AbstractSolver[ConfigT, ResultT, np.ndarray]):
             axes,
         )
 
-    def _knn_trajectories(self, query_desc: np.ndarray) -> List[Optional[Trajectory]]:
+    def _knn_indices(self, query_desc: np.ndarray) -> np.ndarray:
         if self.axes is not None:
             query_desc = query_desc[self.axes]
-        k_nearests = self.tree.query(np.array([query_desc]), k=self.knn, return_distance=False)[0]
-        return [self.trajectories[i] for i in k_nearests]
+        # NOTE: tree query only selects k nearest points (no full sort over the dataset)
+        return self.tree.query(query_desc.reshape(1, -1), k=self.knn, return_distance=False)[0]
 
     def _solve(self, query_desc: Optional[np.ndarray] = None) -> ResultT:
         if query_desc is not None:
-            trajs = self._knn_trajectories(query_desc)
-            trajs_without_none = [traj for traj in trajs if traj is not None]
-            count_none = len(trajs) - len(trajs_without_none)
+            k_nearests = self._knn_indices(query_desc)
+            is_none = self._none_mask[k_nearests]
+            count_none = int(is_none.sum())
             seems_infeasible = count_none >= self.infeasibility_threshold
 
             if self.conservative:
@@ -264,24 +273,24 @@ class NearestNeigborSolver(AbstractSolver[ConfigT, ResultT, np.ndarray]):
                 assert not seems_infeasible
 
             if seems_infeasible:
-                return self.get_result_type().abnormal()
+                return self._result_type.abnormal()
 
-            for guiding_traj in trajs_without_none:
-                if guiding_traj is not None:
-                    result = self.internal_solver._solve(guiding_traj)
-                    if result.traj is not None:
+            for idx in k_nearests[~is_none]:
+                guiding_traj = self.trajectories[idx]
+                result = self._solve_delegated(self.internal_solver, guiding_traj)
+                if result.traj is not None:
 
-                        if self.conservative:
-                            self.previous_false_positive = False
+                    if self.conservative:
+                        self.previous_false_positive = False
 
-                        return result
+                    return result
             if self.conservative:
                 self.previous_false_positive = True
 
-            return self.get_result_type().abnormal()
+            return self._result_type.abnormal()
         else:
             reuse_traj = None
-            result = self.internal_solver._solve(reuse_traj)
+            result = self._solve_delegated(self.internal_solver, reuse_traj)
             return result
 
     def get_result_type(self) -> Type[ResultT]:
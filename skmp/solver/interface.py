@@ -1,10 +1,10 @@
+import math
 import multiprocessing
+import multiprocessing.pool
 import os
-import signal
 import time
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
-from datetime import datetime
+from dataclasses import dataclass, field
 from typing import Any, Generic, Optional, Protocol, Tuple, Type, TypeVar, Union
 
 import numpy as np
@@ -16,8 +16,9 @@ from skmp.constraint import (
     BoxConst,
     IneqCompositeConst,
 )
-from skmp.solver.motion_step_box import is_valid_motion_step
+from skmp.solver.motion_step_box import is_valid_motion_steps
 from skmp.trajectory import Trajectory
+from skmp.utils import set_rng
 
 GoalConstT = TypeVar("GoalConstT")
 GlobalIneqConstT = TypeVar("GlobalIneqConstT")
@@ -39,6 +40,20 @@ class Problem:
     eqconst_admissible_mse: float = 1e-6
     motion_step_box_: Union[float, np.ndarray] = 0.1
     skip_init_feasibility_check: bool = False  # just for debug
+    _n_dim: int = field(init=False, repr=False, compare=False)
+    _motion_step_box: np.ndarray = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self._n_dim = len(self.start)
+        if isinstance(self.motion_step_box_, np.ndarray):
+            assert self.motion_step_box_.shape == (self._n_dim,)
+            self._motion_step_box = self.motion_step_box_
+        else:
+            self._motion_step_box = np.full(self._n_dim, float(self.motion_step_box_))
+
+    @property
+    def n_dim(self) -> int:
+        return self._n_dim
 
     def check_init_feasibility(self) -> Tuple[bool, str]:
         if self.skip_init_feasibility_check:
@@ -59,25 +74,22 @@ class Problem:
 
     @property
     def motion_step_box(self) -> np.ndarray:
-        if isinstance(self.motion_step_box_, np.ndarray):
-            return self.motion_step_box_
-
-        n_dim = len(self.start)
-        motion_step_box = np.ones(n_dim) * self.motion_step_box_
-        return motion_step_box
+        return self._motion_step_box
 
     def is_constrained(self) -> bool:
         return self.global_eq_const is not None
 
     def is_satisfied(self, traj: Trajectory) -> bool:
+        qs = traj.numpy()  # materialize once and share among the checks below
+
         # check goal satsifaction
-        vals, _ = self.goal_const.evaluate_single(traj[-1], with_jacobian=False)
+        vals, _ = self.goal_const.evaluate_single(qs[-1], with_jacobian=False)
         if vals.dot(vals) > self.eqconst_admissible_mse:
             return False
 
         # check ineq satisfaction
         if self.global_ineq_const is not None:
-            valss, _ = self.global_ineq_const.evaluate(traj.numpy(), with_jacobian=False)
+            valss, _ = self.global_ineq_const.evaluate(qs, with_jacobian=False)
             if not np.all(valss > 0):
                 return False
 
@@ -85,10 +97,8 @@ class Problem:
         if self.global_ineq_const is not None:
             # note: we will not check eqality constraint because checking requires
             # traversing on manifold and its bit difficult to implement
-            for i in range(len(traj) - 1):
-                q1, q2 = traj[i], traj[i + 1]
-                if not is_valid_motion_step(self.motion_step_box, q1, q2, self.global_ineq_const):  # type: ignore[arg-type]
-                    return False
+            if not is_valid_motion_steps(self.motion_step_box, qs, self.global_ineq_const):  # type: ignore[arg-type]
+                return False
         return True
 
 
@@ -109,16 +119,37 @@ class ResultProtocol(Protocol):
         ...
 
 
+class CancelToken(Protocol):
+    def is_set(self) -> bool:
+        ...
+
+
+class SolverCancelled(Exception):
+    """raised inside the solver when its cancel_token is set"""
+
+
 class AbstractSolver(ABC, Generic[ConfigT, ResultT, GuidingTrajT]):
     config: ConfigT
     problem: Optional[Problem]
+    cancel_token: Optional[CancelToken] = None
+    _deadline: float = math.inf  # in time.monotonic()
+    _result_type: Type[ResultT]  # cache of get_result_type(), set in setup
 
     @abstractmethod
     def get_result_type(self) -> Type[ResultT]:
         ...
 
+    def check_interruption(self) -> None:
+        """solvers are supposed to call this at their iteration boundaries
+        (e.g. in the is_valid callback) so that they can exit cleanly"""
+        if time.monotonic() > self._deadline:
+            raise TimeoutError
+        if self.cancel_token is not None and self.cancel_token.is_set():
+            raise SolverCancelled
+
     def setup(self, problem: Problem) -> None:
         """setup solver for a paticular problem"""
+        self._result_type = self.get_result_type()
         self._setup(problem)
         self.problem = problem
 
@@ -134,12 +165,8 @@ class AbstractSolver(ABC, Generic[ConfigT, ResultT, GuidingTrajT]):
 
         if self.config.timeout is not None:
             assert self.config.timeout > 0
-
-            def handler(sig, frame):
-                raise TimeoutError
-
-            signal.signal(signal.SIGALRM, handler)
-            signal.setitimer(signal.ITIMER_REAL, self.config.timeout)
+            # NOTE: the deadline is polled by the solver via check_interruption
+            self._deadline = time.monotonic() + self.config.timeout
 
         try:
             assert self.problem is not None
@@ -149,12 +176,11 @@ class AbstractSolver(ABC, Generic[ConfigT, ResultT, GuidingTrajT]):
             else:
                 if raise_init_infeasible:
                     raise RuntimeError(f"initial state is already infeasible: {msg}")
-                ret = self.get_result_type().abnormal()
-        except TimeoutError:
-            ret = self.get_result_type().abnormal()
-
-        if self.config.timeout is not None:
-            signal.alarm(0)  # reset alarm
+                ret = self._result_type.abnormal()
+        except (TimeoutError, SolverCancelled):
+            ret = self._result_type.abnormal()
+        finally:
+            self._deadline = math.inf
 
         ret.time_elapsed = time.time() - ts
         return ret
@@ -163,50 +189,155 @@ class AbstractSolver(ABC, Generic[ConfigT, ResultT, GuidingTrajT]):
     def _solve(self, guiding_traj: Optional[GuidingTrajT] = None) -> ResultT:
         ...
 
+    def _solve_delegated(
+        self, solver: "AbstractSolver[Any, ResultT, Any]", guiding_traj: Any
+    ) -> ResultT:
+        """call _solve of the wrapped solver so that it observes the deadline and
+        the cancel_token of this solver"""
+        deadline, cancel_token = solver._deadline, solver.cancel_token
+        solver._deadline, solver.cancel_token = self._deadline, self.cancel_token
+        try:
+            return solver._solve(guiding_traj)
+        finally:
+            solver._deadline, solver.cancel_token = deadline, cancel_token
+
     def as_parallel_solver(self, n_process=4) -> "ParallelSolver[ConfigT, ResultT, GuidingTrajT]":
         return ParallelSolver(self.config, self, n_process)
 
 
+# internal solver and the problem held by each worker process of ParallelSolver
+_worker_solver: Optional[AbstractSolver] = None
+_worker_problem: Optional[Problem] = None
+# kept alive to keep the thread limit of the worker process
+_worker_threadpool_limits: Optional[threadpoolctl.threadpool_limits] = None
+
+
+def _parallel_solve_init(
+    solver: AbstractSolver, problem: Problem, cancel_token: CancelToken
+) -> None:
+    """initializer of the worker process of ParallelSolver"""
+    global _worker_solver, _worker_problem, _worker_threadpool_limits
+    # NOTE: token is set to the worker's copy so that the caller's solver is kept untouched
+    solver.cancel_token = cancel_token
+    _worker_solver = solver
+    _worker_problem = problem
+
+    # prevend numpy from using multi-thread
+    # NOTE: env var is for the libraries that are loaded after the fork
+    os.environ["OMP_NUM_THREADS"] = "1"
+    _worker_threadpool_limits = threadpoolctl.threadpool_limits(limits=1, user_api="blas")
+    # forked workers inherit the random state, so reseed with a worker-unique value
+    rng = np.random.default_rng(os.getpid() ^ time.time_ns())
+    set_rng(rng)
+    # NOTE: global state is still seeded for the code which does not go through get_rng
+    np.random.seed(int(rng.integers(2**32)))
+
+
+def _parallel_solve_inner(task: Tuple[Optional[Any], float]) -> Any:
+    """assume to be used in multi processing"""
+    assert _worker_solver is not None and _worker_problem is not None
+    replan_info, deadline = task
+    # NOTE: internal solver is not necessarily reusable after _solve (e.g. OMPLSolver
+    # drops its problem). So setup it again only in that case to keep the worker reusable.
+    if _worker_solver.problem is None:
+        _worker_solver.setup(_worker_problem)
+    _worker_solver._deadline = deadline
+    try:
+        return _worker_solver._solve(replan_info)
+    except (TimeoutError, SolverCancelled):
+        return _worker_solver._result_type.abnormal()
+
+
 @dataclass
 class ParallelSolver(AbstractSolver, Generic[ConfigT, ResultT, GuidingTrajT]):
     config: ConfigT
     internal_solver: AbstractSolver[ConfigT, ResultT, GuidingTrajT]
     n_process: int = 4
+    cancel_timeout: float = 1.0  # workers not finished within this after cancel/deadline are killed
+    _pool: Optional[multiprocessing.pool.Pool] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _cancel_event: Optional[Any] = field(default=None, init=False, repr=False, compare=False)
 
     def get_result_type(self) -> Type[ResultT]:
         return self.internal_solver.get_result_type()
 
+    def __enter__(self) -> "ParallelSolver[ConfigT, ResultT, GuidingTrajT]":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
     def _setup(self, problem: Problem) -> None:
         self.internal_solver.setup(problem)
-
-    def _parallel_solve_inner(self, replan_info: Optional[GuidingTrajT] = None) -> ResultT:
-        """assume to be used in multi processing"""
-        # prevend numpy from using multi-thread
-        unique_seed = datetime.now().microsecond + os.getpid()
-        np.random.seed(unique_seed)
-        with threadpoolctl.threadpool_limits(limits=1, user_api="blas"):
-            return self.internal_solver._solve(replan_info)
+        # workers are forked with the setup internal solver, so the current ones
+        # are stale. The pool is re-created lazily on the next solve
+        self._close_pool()
+
+    def close(self) -> None:
+        """terminate the worker processes. solver can still be used after this,
+        and the workers are forked again on the next solve"""
+        self._close_pool()
+
+    def _create_pool(self) -> multiprocessing.pool.Pool:
+        assert self.problem is not None
+        ctx = multiprocessing.get_context("fork")
+        # shared with the workers to notify that some worker already found a solution
+        self._cancel_event = ctx.Event()
+        return ctx.Pool(
+            self.n_process,
+            initializer=_parallel_solve_init,
+            initargs=(self.internal_solver, self.problem, self._cancel_event),
+        )
+
+    def _close_pool(self) -> None:
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        self._cancel_event = None
 
     def _solve(self, replan_info: Optional[GuidingTrajT] = None) -> ResultT:
-        processes = []
-        result_queue: multiprocessing.Queue[ResultT] = multiprocessing.Queue()
-
-        for i in range(self.n_process):
-            p = multiprocessing.Process(
-                target=lambda: result_queue.put(self._parallel_solve_inner(replan_info))
-            )
-            processes.append(p)
-            p.start()
-
-        for _ in range(self.n_process):
-            result = result_queue.get()
-            if result.traj is not None:
-                for p in processes:
-                    p.terminate()
-                for p in processes:
-                    p.join()
-                return result
-        return result.abnormal()
+        if self._pool is None:
+            self._pool = self._create_pool()
+        cancel_event = self._cancel_event
+        assert cancel_event is not None
+
+        # NOTE: workers share the deadline, as time.monotonic is system-wide
+        tasks = [(replan_info, self._deadline)] * self.n_process
+        results = self._pool.imap_unordered(_parallel_solve_inner, tasks)
+        success_result: Optional[ResultT] = None
+        n_finished = 0
+        try:
+            while n_finished < self.n_process:
+                result = results.next(timeout=self._wait_timeout())
+                n_finished += 1
+                if result.traj is not None:
+                    success_result = result
+                    break
+
+            if success_result is not None:
+                # let the other workers exit cleanly rather than terminating them
+                cancel_event.set()
+                for _ in range(self.n_process - n_finished):
+                    results.next(timeout=self.cancel_timeout)
+        except multiprocessing.TimeoutError:
+            # some workers did not respond to the cancellation or the deadline
+            self._close_pool()
+        except BaseException:
+            self._close_pool()
+            raise
+        finally:
+            cancel_event.clear()
+
+        if success_result is None:
+            return self._result_type.abnormal()
+        return success_result
+
+    def _wait_timeout(self) -> Optional[float]:
+        if math.isinf(self._deadline):
+            return None
+        return max(self._deadline - time.monotonic(), 0.0) + self.cancel_timeout
 
 
 class AbstractScratchSolver(AbstractSolver[ConfigT, ResultT, Trajectory]):
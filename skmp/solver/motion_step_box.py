@@ -1,13 +1,12 @@
-from typing import List
-
 import numpy as np
 
 from skmp.constraint import AbstractIneqConst
+from skmp.utils import get_scratch, put_scratch
 
 
 def interpolate_fractions(
     motion_step_box: np.ndarray, q1: np.ndarray, q2: np.ndarray, include_q1: bool
-) -> List[float]:
+) -> np.ndarray:
     # Note that q1 is omitted as in the checkMotion in ompl
     assert motion_step_box is not None
 
@@ -19,25 +18,23 @@ def interpolate_fractions(
     diff_active_axis = diff[active_idx]
     two_point_two_close = abs(diff_active_axis) < 1e-6
     if two_point_two_close:
-        return []
+        return np.empty(0)
 
     step_ratio = motion_step_box[active_idx] / abs(diff_active_axis)
     if step_ratio > 1.0:
-        return [1.0]  # only the last one
+        return np.ones(1)  # only the last one
 
-    travel_rate = 0.0
-    interp_fractions = []
+    # NOTE: cumsum accumulates in the same order as adding step_ratio one by one,
+    # and the last element is always beyond 1.0
+    n_step_max = int(np.ceil(1.0 / step_ratio)) + 1
+    travel_rates = np.cumsum(np.full(n_step_max, step_ratio))
+    travel_rates = travel_rates[travel_rates < 1.0]
 
     if include_q1:
-        interp_fractions.append(travel_rate)
-
-    while travel_rate + step_ratio < 1.0:
-        travel_rate += step_ratio
-        interp_fractions.append(travel_rate)
-    if abs(interp_fractions[-1] - 1) > 1e-6:
-        interp_fractions.append(1.0)
-
-    return interp_fractions
+        travel_rates = np.hstack(([0.0], travel_rates))
+    if len(travel_rates) == 0 or abs(travel_rates[-1] - 1) > 1e-6:
+        travel_rates = np.hstack((travel_rates, [1.0]))
+    return travel_rates
 
 
 def is_valid_motion_step(
@@ -55,3 +52,51 @@ def is_valid_motion_step(
         if not is_valid:
             return False
     return True
+
+
+def is_valid_motion_steps(
+    motion_step_box: np.ndarray,
+    qs: np.ndarray,
+    ineq_const: AbstractIneqConst,
+) -> bool:
+    """batched version of is_valid_motion_step over all segments of qs
+    input:
+        qs: (n_point, n_dim) waypoints
+    output:
+        true if all the segments (qs[i], qs[i + 1]) are valid
+    """
+    q1s, q2s = qs[:-1], qs[1:]
+    fractions_list = [
+        interpolate_fractions(motion_step_box, q1, q2, True) for q1, q2 in zip(q1s, q2s)
+    ]
+    n_samples = [len(fractions) for fractions in fractions_list]
+    if sum(n_samples) == 0:
+        return True
+
+    # NOTE: all the interpolated points are evaluated at once to amortize
+    # the constraint call overhead
+    fractions = np.hstack(fractions_list)
+    seg_indices = np.repeat(np.arange(len(q1s)), n_samples)
+
+    # NOTE: round up the number of rows so that the scratch buffers are reused
+    # among trajectories of similar length
+    qs = np.asarray(qs, dtype=np.float64)
+    n_total = len(fractions)
+    shape = (1 << (n_total - 1).bit_length(), qs.shape[1])
+    buffer_q1 = get_scratch(shape)
+    buffer = get_scratch(shape)
+    try:
+        # q_test = q1 + (q2 - q1) * fraction, without allocating (n_total, n_dim) arrays
+        q1_tests = buffer_q1[:n_total]
+        q_tests = buffer[:n_total]
+        # NOTE: mode="raise" (default) internally buffers the output, so use "clip"
+        np.take(qs, seg_indices, axis=0, out=q1_tests, mode="clip")
+        np.take(qs, seg_indices + 1, axis=0, out=q_tests, mode="clip")
+        q_tests -= q1_tests
+        q_tests *= fractions[:, None]
+        q_tests += q1_tests
+        fss, _ = ineq_const.evaluate(q_tests, False)
+    finally:
+        put_scratch(buffer)
+        put_scratch(buffer_q1)
+    return bool(np.all(fss > 0.0))
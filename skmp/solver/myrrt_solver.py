@@ -73,7 +73,11 @@ class MyRRTSolverBase(AbstractScratchSolver[MyRRTConfig, MyRRTResult]):
         else:
             ineq_const = self.problem.global_ineq_const if collision_aware else None
             res = satisfy_by_optimization(
-                self.problem.global_eq_const, self.problem.box_const, ineq_const, q
+                self.problem.global_eq_const,
+                self.problem.box_const,
+                ineq_const,
+                q,
+                check_interruption=self.check_interruption,
             )
             if res.success:
                 return res.q
@@ -82,6 +86,7 @@ class MyRRTSolverBase(AbstractScratchSolver[MyRRTConfig, MyRRTResult]):
 
     def is_valid(self, q: np.ndarray) -> bool:
         assert self.problem is not None
+        self.check_interruption()
         if self.problem.global_ineq_const is None:
             return True
         val, _ = self.problem.global_ineq_const.evaluate_single(q, False)
@@ -113,6 +118,7 @@ class MyRRTSolver(MyRRTSolverBase):
                 self.problem.global_ineq_const,
                 q,
                 config=satis_conf,
+                check_interruption=self.check_interruption,
             )
             if res.success:
                 return res.q
@@ -155,6 +161,7 @@ class MyRRTConnectSolver(MyRRTSolverBase):
                 self.problem.box_const,
                 self.problem.global_ineq_const,
                 None,
+                check_interruption=self.check_interruption,
             )
             if satisfy_result.success:
                 break
@@ -203,6 +210,7 @@ class MyRRTConnectSolver(MyRRTSolverBase):
                     self.problem.box_const,
                     self.problem.global_ineq_const,
                     subgoal_cand,
+                    check_interruption=self.check_interruption,
                 )
             else:
                 satisfy_result = satisfy_by_optimization(
@@ -210,6 +218,7 @@ class MyRRTConnectSolver(MyRRTSolverBase):
                     self.problem.box_const,
                     self.problem.global_ineq_const,
                     subgoal_cand,
+                    check_interruption=self.check_interruption,
                 )
 
             if not satisfy_result.success:
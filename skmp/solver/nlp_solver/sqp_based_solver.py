@@ -19,7 +19,7 @@ from skmp.trajectory import Trajectory
 def translate(
     problem: Problem, n_wp: int
 ) -> Tuple[TrajectoryEqualityConstraint, TrajectoryInequalityConstraint]:
-    n_dof = len(problem.start)
+    n_dof = problem.n_dim
 
     # equality
     traj_eq_const = TrajectoryEqualityConstraint(n_dof, n_wp, {}, [])
@@ -151,7 +151,7 @@ class SQPBasedSolver(AbstractScratchSolver[SQPBasedSolverConfig, SQPBasedSolverR
     def _setup(self, problem: Problem) -> None:
         config = self.config
         traj_eq_const, traj_ineq_const = translate(problem, config.n_wp)
-        n_dof = len(problem.start)
+        n_dof = problem.n_dim
         smooth_mat = smoothcost_fullmat(n_dof, config.n_wp)
 
         box_const = problem.box_const
@@ -180,6 +180,7 @@ class SQPBasedSolver(AbstractScratchSolver[SQPBasedSolverConfig, SQPBasedSolverR
         def ineq_tighten(x):
             # somehow, osqp-sqp result has some ineq error
             # thus to compensate that, we tighten the ineq constraint here
+            self.check_interruption()
             f, jac = traj_ineq_const.evaluate(x)
             return f - ctol_ineq * config.ineq_tighten_coef, jac
 
@@ -208,6 +209,7 @@ class SQPBasedSolver(AbstractScratchSolver[SQPBasedSolverConfig, SQPBasedSolverR
                     self.problem.box_const,
                     self.problem.global_ineq_const,
                     None,
+                    check_interruption=self.check_interruption,
                 )
                 if satisfy_result.success:
                     break
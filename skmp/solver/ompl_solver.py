@@ -73,6 +73,7 @@ class OMPLSolverBase(AbstractSolver[OMPLSolverConfig, OMPLSolverResult, Trajecto
 
         def is_valid(q_: List[float]) -> bool:
             self._n_call_dict["count"] += 1
+            self.check_interruption()
             q = np.array(q_)
             if problem.global_ineq_const is None:
                 return True
@@ -141,6 +142,7 @@ class OMPLSolverBase(AbstractSolver[OMPLSolverConfig, OMPLSolverResult, Trajecto
                 self.problem.box_const,
                 self.problem.global_ineq_const,
                 q_seed=q_ik_guess,
+                check_interruption=self.check_interruption,
             )
         else:
             for _ in range(self.config.n_max_satisfaction_trial):
@@ -149,6 +151,7 @@ class OMPLSolverBase(AbstractSolver[OMPLSolverConfig, OMPLSolverResult, Trajecto
                     self.problem.box_const,
                     self.problem.global_ineq_const,
                     None,
+                    check_interruption=self.check_interruption,
                 )
                 if satisfy_result.success:
                     break
@@ -1,12 +1,19 @@
 import copy
 from pathlib import Path
-from typing import Dict
+from types import ModuleType
+from typing import Dict, List, Optional, Tuple, Union
 
+import numpy as np
 from skrobot.utils.checksum import checksum_md5
 from skrobot.utils.urdf import URDF
 
 _loaded_urdf_models_with_geometry: Dict[str, URDF] = {}
 _loaded_urdf_models: Dict[str, URDF] = {}
+_scratch_buffers: Dict[Tuple[int, ...], List[np.ndarray]] = {}
+_n_max_scratch_per_shape = 4
+# random generator used for sampling in skmp. np.random module (global state) by default
+# so that np.random.seed works as usual
+_rng: Union[np.random.Generator, ModuleType] = np.random
 
 
 def load_urdf_model_using_cache(file_path: Path, with_geometry: bool = False):
@@ -30,3 +37,28 @@ def load_urdf_model_using_cache(file_path: Path, with_geometry: bool = False):
         return copy.deepcopy(_loaded_urdf_models_with_geometry[hashvalue])
     else:
         return copy.deepcopy(_loaded_urdf_models[hashvalue])
+
+
+def get_scratch(shape: Tuple[int, ...]) -> np.ndarray:
+    """get an uninitialized float array from the free list (or allocate it)
+    The array must be returned by put_scratch after use."""
+    buffers = _scratch_buffers.get(shape)
+    if buffers:
+        return buffers.pop()
+    return np.empty(shape)
+
+
+def put_scratch(arr: np.ndarray) -> None:
+    buffers = _scratch_buffers.setdefault(arr.shape, [])
+    if len(buffers) < _n_max_scratch_per_shape:
+        buffers.append(arr)
+
+
+def set_rng(rng: Optional[np.random.Generator]) -> None:
+    """set random generator used for sampling. None to use the global state of np.random"""
+    global _rng
+    _rng = np.random if rng is None else rng
+
+
+def get_rng() -> Union[np.random.Generator, ModuleType]:
+    return _rng
@@ -1,7 +1,16 @@
+import multiprocessing
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
 import numpy as np
 from utils import create_standard_problem
 
+from skmp.constraint import BoxConst, ConfigPointConst
+from skmp.solver.datadriven import NearestNeigborSolver
+from skmp.solver.interface import AbstractSolver, Problem
 from skmp.solver.ompl_solver import OMPLSolver, OMPLSolverConfig
+from skmp.trajectory import Trajectory
 
 
 def test_timeout():  # noqa
@@ -16,3 +25,100 @@ def test_timeout():  # noqa
     assert result.traj is None
     assert result.time_elapsed is not None
     assert np.abs(result.time_elapsed - timeout) < 1e-3
+
+
+def test_timeout_nearest_neighbor():  # noqa
+    # the deadline must be observed also by the solver wrapped by NearestNeigborSolver
+    problem = create_standard_problem(feasible=False)
+    timeout = 1.5
+    conf = OMPLSolverConfig(n_max_call=100000, n_max_satisfaction_trial=100000, timeout=timeout)
+    dataset = [(np.zeros(1), Trajectory([problem.start, problem.start]))]
+    solver = NearestNeigborSolver.init(OMPLSolver, conf, dataset, infeasibility_threshold=1)  # type: ignore
+    solver.setup(problem)
+    result = solver.solve()
+    assert result.traj is None
+    assert result.time_elapsed is not None
+    assert np.abs(result.time_elapsed - timeout) < 1e-3
+
+
+@dataclass
+class _StubConfig:
+    n_max_call: int = 0
+    timeout: Optional[float] = None
+
+
+@dataclass
+class _StubResult:
+    traj: Optional[Trajectory]
+    time_elapsed: Optional[float] = None
+    n_call: int = 0
+
+    @classmethod
+    def abnormal(cls) -> "_StubResult":
+        return cls(None)
+
+
+class _StubSolver(AbstractSolver[_StubConfig, _StubResult, Any]):
+    """only the first process that takes the ticket succeeds immediately (if succeed is True),
+    and the others keep polling check_interruption until they are interrupted"""
+
+    def __init__(self, config: _StubConfig, succeed: bool) -> None:
+        self.config = config
+        self.problem = None
+        self.succeed = succeed
+        self.ticket = multiprocessing.get_context("fork").Value("i", 0)
+
+    def get_result_type(self):
+        return _StubResult
+
+    def _setup(self, problem: Problem) -> None:
+        pass
+
+    def _solve(self, guiding_traj: Optional[Any] = None) -> _StubResult:
+        assert self.problem is not None
+        with self.ticket.get_lock():
+            self.ticket.value += 1
+            is_first = self.ticket.value == 1
+        if self.succeed and is_first:
+            return _StubResult(Trajectory([self.problem.start]))
+        while True:
+            self.check_interruption()
+            time.sleep(0.01)
+
+
+def _create_stub_problem() -> Problem:
+    box_const = BoxConst(-np.ones(2), np.ones(2))
+    return Problem(np.zeros(2), box_const, ConfigPointConst(np.zeros(2)), None, None)
+
+
+def test_parallel_solver():  # noqa
+    problem = _create_stub_problem()
+
+    # the first success cancels the others, and the workers are reused
+    internal_solver = _StubSolver(_StubConfig(timeout=None), succeed=True)
+    with internal_solver.as_parallel_solver(n_process=4) as solver:
+        solver.setup(problem)
+        pids = None
+        for _ in range(3):
+            internal_solver.ticket.value = 0
+            ts = time.time()
+            result = solver.solve()
+            assert result.traj is not None
+            assert time.time() - ts < solver.cancel_timeout
+            pids_now = {p.pid for p in multiprocessing.active_children()}
+            assert len(pids_now) == 4
+            assert pids is None or pids == pids_now
+            pids = pids_now
+    assert len(multiprocessing.active_children()) == 0
+
+    # never-succeeding workers are interrupted by the deadline
+    timeout = 0.5
+    internal_solver = _StubSolver(_StubConfig(timeout=timeout), succeed=False)
+    solver = internal_solver.as_parallel_solver(n_process=4)
+    solver.setup(problem)
+    result = solver.solve()
+    assert result.traj is None
+    assert result.time_elapsed is not None
+    assert np.abs(result.time_elapsed - timeout) < 0.1
+    solver.close()
+    assert len(multiprocessing.active_children()) == 0
@@ -1,6 +1,23 @@
+from typing import Optional, Tuple
+
 import numpy as np
+from skrobot.model import RobotModel
+
+from skmp.constraint import AbstractIneqConst
+from skmp.solver.motion_step_box import (
+    interpolate_fractions,
+    is_valid_motion_step,
+    is_valid_motion_steps,
+)
+
+
+class CircleConstraint(AbstractIneqConst):
+    def _evaluate(self, qs: np.ndarray, with_jacobian: bool) -> Tuple[np.ndarray, np.ndarray]:
+        fs = np.sum(qs**2, axis=1) - 1.0
+        return fs[:, None], self.dummy_jacobian()
 
-from skmp.solver.motion_step_box import interpolate_fractions
+    def _reflect_skrobot_model(self, robot_model: Optional[RobotModel]) -> None:
+        pass
 
 
 def test_interpolation_fraction():
@@ -21,3 +38,17 @@ def test_interpolation_fraction():
     fractions = np.array(interpolate_fractions(box, np.zeros(2), np.ones(2) * 1.1, False))
     fractions_gt = np.hstack((np.linspace(0, 1, 11)[1:], 1.1)) / 1.1
     np.testing.assert_almost_equal(fractions, fractions_gt)
+
+
+def test_is_valid_motion_steps():
+    box = np.array([0.1, 0.2])
+    const = CircleConstraint()
+    const.reflect_skrobot_model(None)
+
+    for _ in range(100):
+        qs = np.random.uniform(-2.0, 2.0, (5, 2))
+        qs[2] = qs[1]  # zero-length segment
+        expected = all(
+            is_valid_motion_step(box, qs[i], qs[i + 1], const) for i in range(len(qs) - 1)
+        )
+        assert is_valid_motion_steps(box, qs, const) == expected
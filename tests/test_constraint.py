@@ -1,7 +1,6 @@
-from copy import deepcopy
-
 import numpy as np
-from skrobot.coordinates import Coordinates
+import pytest
+from skrobot.coordinates import Coordinates, rpy_angle
 from skrobot.model.primitives import Box
 from skrobot.models import PR2
 from skrobot.utils.urdf import mesh_simplify_factor
@@ -14,6 +13,7 @@ from skmp.constraint import (
     FixedZAxisConstraint,
     IneqCompositeConst,
     PairWiseSelfCollFreeConst,
+    PointCollFreeConst,
     PoseConstraint,
     RelativePoseConstraint,
 )
@@ -23,37 +23,29 @@ from skmp.robot.pr2 import PR2Config
 from skmp.robot.utils import get_robot_state
 
 
-def jac_numerical(const: AbstractConst, q0: np.ndarray, eps: float) -> np.ndarray:
-    f0, _ = const.evaluate_single(q0, with_jacobian=False)
-    dim_domain = len(q0)
-    dim_codomain = len(f0)
-
-    jac = np.zeros((dim_codomain, dim_domain))
-    for i in range(dim_domain):
-        q1 = deepcopy(q0)
-        q1[i] += eps
-        f1, _ = const.evaluate_single(q1, with_jacobian=False)
-        jac[:, i] = (f1 - f0) / eps
-    return jac
+def jac_numerical(const: AbstractConst, qs0: np.ndarray, eps: float) -> np.ndarray:
+    # evaluate all the points and their perturbations at once
+    n_point, dim_domain = qs0.shape
+    qs = np.repeat(qs0[:, None, :], dim_domain + 1, axis=1)
+    qs[:, 1:, :] += np.eye(dim_domain) * eps
+    fs, _ = const.evaluate(qs.reshape(-1, dim_domain), with_jacobian=False)
+    fs = fs.reshape(n_point, dim_domain + 1, -1)
+    return ((fs[:, 1:, :] - fs[:, :1, :]) / eps).transpose(0, 2, 1)
 
 
 def check_jacobian(
     const: AbstractConst, dim: int, eps: float = 1e-7, decimal: int = 4, std: float = 1.0
 ):
-    # check single jacobian
-    for _ in range(10):
-        q_test = np.random.randn(dim) * std
-        _, jac_anal = const.evaluate_single(q_test, with_jacobian=True)
-        jac_numel = jac_numerical(const, q_test, eps)
-        np.testing.assert_almost_equal(jac_anal, jac_numel, decimal=decimal)
-
-    # check traj jacobian
     for _ in range(10):
         qs_test = np.random.randn(10, dim) * std
         _, jac_anal = const.evaluate(qs_test, with_jacobian=True)
-        jac_numel = np.array([jac_numerical(const, q, eps) for q in qs_test])
+        jac_numel = jac_numerical(const, qs_test, eps)
         np.testing.assert_almost_equal(jac_anal, jac_numel, decimal=decimal)
 
+        # single evaluation must be consistent with the batch one
+        _, jac_anal_single = const.evaluate_single(qs_test[0], with_jacobian=True)
+        np.testing.assert_almost_equal(jac_anal_single, jac_anal[0])
+
 
 def test_box_const():
     config = PR2Config(base_type=BaseType.FIXED)
@@ -63,6 +55,24 @@ def test_box_const():
     # check if id_value is assigned
     assert isinstance(box_const.id_value, str)
 
+    # check if violated joint is correctly reported
+    q = 0.5 * (box_const.lb + box_const.ub)
+    q[3] = box_const.ub[3] + 0.1
+    msgs = []  # type: ignore
+    box_const.write_violation_info(q, msgs)
+    assert len(msgs) == 1
+    assert box_const.names is not None
+    assert msgs[0].startswith(f"ub violation: {box_const.names[3]} ")
+
+
+class SphereSDF:
+    def __call__(self, xs: np.ndarray) -> np.ndarray:
+        return np.linalg.norm(xs, axis=1) - 0.5
+
+    def value_and_grad(self, xs: np.ndarray):
+        norms = np.linalg.norm(xs, axis=1)
+        return norms - 0.5, xs / norms[:, None]
+
 
 def test_collfree_const():
     for margin in [0.0, -0.05, 0.05]:
@@ -88,6 +98,36 @@ def test_collfree_const():
             closest_value = collfree_const_oc.evaluate_single(q, False)[0][0]
             assert np.min(values) == closest_value
 
+    # check sdf with analytical gradient gives the same result as finite difference
+    sdf = SphereSDF()
+    for only_closest_feature in [False, True]:
+        const_fd = CollFreeConst(
+            colkin, lambda xs: sdf(xs), PR2(), only_closest_feature=only_closest_feature
+        )
+        const_anal = CollFreeConst(colkin, sdf, PR2(), only_closest_feature=only_closest_feature)
+        check_jacobian(const_anal, 7)
+
+        qs = np.random.randn(10, 7)
+        vals_fd, jacs_fd = const_fd.evaluate(qs, with_jacobian=True)
+        vals_anal, jacs_anal = const_anal.evaluate(qs, with_jacobian=True)
+        np.testing.assert_almost_equal(vals_fd, vals_anal)
+        np.testing.assert_almost_equal(jacs_fd, jacs_anal, decimal=4)
+
+
+def test_point_collfree_const():
+    sdf = SphereSDF()
+    const_fd = PointCollFreeConst(lambda xs: sdf(xs))
+    check_jacobian(const_fd, 3)
+
+    const_anal = PointCollFreeConst(sdf)
+    check_jacobian(const_anal, 3)
+
+    qs = np.random.randn(10, 3)
+    vals_fd, jacs_fd = const_fd.evaluate(qs, with_jacobian=True)
+    vals_anal, jacs_anal = const_anal.evaluate(qs, with_jacobian=True)
+    np.testing.assert_almost_equal(vals_fd, vals_anal)
+    np.testing.assert_almost_equal(jacs_fd, jacs_anal, decimal=4)
+
 
 def test_neural_collfree_const():
     # onnxruntime broke backward compatibility in 1.9
@@ -142,6 +182,25 @@ def test_pose_const():
         # check if id_value is assigned
         assert isinstance(const.id_value, str)
 
+        # description shares memory with the target, so must not be writable
+        assert not const.get_description().flags.writeable
+
+    # check batch conversion of rpy is consistent with skrobot's one
+    efkin.update_rotation_type(RotationType.RPY)
+    for _ in range(10):
+        co = Coordinates(pos=np.random.randn(3))
+        co.rotate(np.random.randn(), np.random.randn(3))
+        const = PoseConstraint.from_skrobot_coords([co], efkin, PR2())
+        rpy = np.flip(rpy_angle(co.worldrot())[0])
+        np.testing.assert_almost_equal(const.get_description(), np.hstack([co.worldpos(), rpy]))
+
+    # also near and at the gimbal lock (pitch = +-pi/2)
+    for pitch in [0.5 * np.pi - 1e-7, 0.5 * np.pi, -0.5 * np.pi + 1e-7, -0.5 * np.pi]:
+        co = Coordinates(pos=np.random.randn(3), rot=[0.7, pitch, 0.3])
+        const = PoseConstraint.from_skrobot_coords([co], efkin, PR2())
+        rpy = np.flip(rpy_angle(co.worldrot())[0])
+        np.testing.assert_almost_equal(const.get_description(), np.hstack([co.worldpos(), rpy]))
+
 
 def test_realtive_pose_const():
     config = PR2Config(base_type=BaseType.FIXED, control_arm="dual")
@@ -244,6 +303,35 @@ def test_composite_constraint():
     # check if id_value is assigned
     assert isinstance(composite_const.id_value, str)
 
+    # check if writing into the preallocated buffer matches naive concatenation
+    box_const = config.get_box_const()
+    composite_const = IneqCompositeConst([box_const, collfree_const, selcol_const])
+    assert composite_const.out_dim() is not None
+    qs = np.random.randn(5, 7)
+    # NOTE: out_dim of the children changes by only_closest_feature even after construction
+    for only_closest_feature in [False, True]:
+        collfree_const.only_closest_feature = only_closest_feature
+        selcol_const.only_closest_feature = only_closest_feature
+        for with_jacobian in [False, True]:
+            values, jacs = composite_const.evaluate(qs, with_jacobian)
+            results = [c.evaluate(qs, with_jacobian) for c in composite_const.const_list]
+            np.testing.assert_almost_equal(values, np.hstack([r[0] for r in results]))
+            if with_jacobian:
+                jacs_expected = np.concatenate([r[1] for r in results], axis=1)
+                np.testing.assert_almost_equal(jacs, jacs_expected)
+    collfree_const.only_closest_feature = False
+    selcol_const.only_closest_feature = False
+
+    # check if a constraint whose output mismatches its out_dim is not silently broadcasted
+    class WrongDimConst(CollFreeConst):
+        def out_dim(self):
+            return self.colkin.n_feature
+
+    wrong_const = WrongDimConst(colkin, box.sdf, pr2, only_closest_feature=True)
+    composite_const = IneqCompositeConst([box_const, wrong_const])
+    with pytest.raises(ValueError):
+        composite_const.evaluate(qs, False)
+
     # check if composite const is properly reduced
     composite_const = IneqCompositeConst([collfree_const, selcol_const, collfree_const])
     assert len(composite_const.const_list) == 2